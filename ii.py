@@ -1,10 +1,18 @@
 from blessed import Terminal
-from itertools import zip_longest
+from itertools import groupby, repeat, chain
+from collections import deque, namedtuple
+from operator import itemgetter
 from utils import text_wrap
+from wcwidth import wcwidth
 import argparse
 import time
 import pickle
 import csv
+import json
+import gc
+import os
+import threading
+import sys
 
 # TODO:
 # maybe some key to add a sibling to the current node (it would be especially nice in conjunction with the point above)
@@ -25,7 +33,7 @@ controls:
 """
 )
 parser.add_argument("--autoloop", action=argparse.BooleanOptionalAction, default=True, help="Whether to loop around automatically")
-parser.add_argument("-f", "--file", type=str, default="tree", help="File name (without extension) to load from and save to. Will create a pickle file with the full state saved, and also a markdown file with the exported tree.")
+parser.add_argument("-f", "--file", type=str, default="tree", help="File name (without extension) to load from and save to. Will create a json file with the full state saved, and also a markdown file with the exported tree. New paragraphs are also appended to a .log journal as they're written, so a crash doesn't lose them. Trees saved as a pickle file by earlier versions are still loaded.")
 args = parser.parse_args()
 if args.autoloop:
     autoscroll_delay = 0.65                                                  
@@ -34,12 +42,27 @@ else:
     autoscroll_delay = None
     initial_timer = 100
 
+# minimum time between two redraws, keys that arrive in the meantime get drawn together
+frame_time = 1 / 60
+
+# read buffer size for pickle files from earlier versions
+pickle_buffer_size = 1 << 20
+
+# an empty screen cell, as (char, style)
+BLANK_CELL = (" ", None)
+
+# how many stream items' rows the editor keeps around before starting over
+styled_row_cache_size = 1024
+
 
 class Node:
     node_id = 0 # shared class variable
 
+    __slots__ = ('text', 'children', 'parent', 'creation_time', 'id', 'parent_id')
+
     def __init__(self, text, parent=None):
-        self.text = text
+        # the same paragraphs tend to come up across branches, so share them (unless they're huge)
+        self.text = sys.intern(text) if len(text) < 1024 else text
         self.children = []
         self.parent = parent
         self.creation_time = time.time()
@@ -48,21 +71,54 @@ class Node:
 
         self.parent_id = parent.id if parent else None
 
+    def __setstate__(self, state):
+        # pickles from before __slots__ store a plain dict, newer ones a (None, slots) pair
+        if isinstance(state, tuple):
+            state = state[1]
+        for name, value in state.items():
+            setattr(self, name, value)
+
     def add_child(self, node):
         self.children.append(node)
 
+    def to_record(self):
+        return {
+            "id": self.id,
+            "parent_id": self.parent_id,
+            "text": self.text,
+            "creation_time": self.creation_time,
+        }
+
+# a paragraph of the current stream, with the number of its siblings on either side
+StreamItem = namedtuple("StreamItem", "text num_before num_after")
+# all the paragraphs at one depth of the current stream, and how many of them are left of the current one
+SiblingsItem = namedtuple("SiblingsItem", "texts nodes_to_left")
+
 class Tree:
     def __init__(self):
         self.root = Node("")
         self.current_stream = []
+        # the nodes along current_stream, starting with the root, so current_path[i] is the node at index i
+        self.current_path = [self.root]
+        self.invalidate_stream_cache()
+        # file that grow appends the record of every new node to, if set
+        self.journal = None
+
+    def invalidate_stream_cache(self):
+        """
+        Drops the cached results of get_stream and get_stream_with_siblings.
+
+        Needs to be called whenever current_stream or the tree changes.
+        """
+        self._stream_cache = None
+        self._stream_with_siblings_cache = None
 
     def node_at_index(self, index):
-        node = self.root
-        for i in range(index):
-            node = node.children[self.current_stream[i]]
-        return node
+        # anything at or before the start of the stream is the root, prev_line can take the index below 0
+        return self.current_path[max(index, 0)]
 
     def grow(self, text, index):
+        index = max(index, 0)
         selected_node = self.node_at_index(index)
 
         self.current_stream = self.current_stream[:index]
@@ -70,6 +126,10 @@ class Tree:
 
         new_node = Node(text, parent=selected_node)
         selected_node.add_child(new_node)
+        self.current_path = self.current_path[:index+1] + [new_node]
+        self.invalidate_stream_cache()
+        if self.journal:
+            self.journal.write(json.dumps(new_node.to_record(), ensure_ascii=False) + "\n")
 
     def switch_stream(self, index, increment, leaf_explore = False):
         """
@@ -84,24 +144,30 @@ class Tree:
 
         If the tree terminates before it descends to current index, it returns the index corresponding to the leaf. 
         """
-        if index is len(self.current_stream):
+        if index == len(self.current_stream):
             leaf_explore = True
         original_index = index
         while index > 1:
-            parent = self.node_at_index(index-1)
+            parent = self.current_path[index-1]
             new_stream_at_index = self.current_stream[index-1] + increment
             if new_stream_at_index >= 0 and new_stream_at_index < len(parent.children):
-                self.current_stream = self.current_stream[:index-1] + [new_stream_at_index]
+                # cut the stream and path back to the parent and descend again from the sibling, in place
+                del self.current_stream[index-1:]
+                del self.current_path[index:]
                 node = parent.children[new_stream_at_index]
+                self.current_stream.append(new_stream_at_index)
+                self.current_path.append(node)
                 while node.children:
                     if increment >= 0:
-                        self.current_stream += [0]
+                        self.current_stream.append(0)
                         node = node.children[0]
                     else:
-                        self.current_stream += [len(node.children)-1]
+                        self.current_stream.append(len(node.children)-1)
                         node = node.children[-1]
+                    self.current_path.append(node)
                     if leaf_explore:
                         index += 1
+                self.invalidate_stream_cache()
                 return index
             # there were no siblings at current depth, so move up
             index -= 1
@@ -109,27 +175,23 @@ class Tree:
         return original_index
 
     def get_stream(self):
-        stream = []
-        node = self.root
-        for step in self.current_stream:
-            n = len(node.children)
-            node = node.children[step]
-            stream.append({
-                "text": node.text,
-                "num_before": step,
-                "num_after": n - step - 1
-            })
+        if self._stream_cache is not None:
+            return self._stream_cache
+        stream = [
+            StreamItem(node.children[step].text, step, len(node.children) - step - 1)
+            for node, step in zip(self.current_path, self.current_stream)
+        ]
+        self._stream_cache = stream
         return stream
     
     def get_stream_with_siblings(self):
-        stream = []
-        node = self.root
-        for step in self.current_stream:
-            stream.append({
-                "texts": [s.text for s in node.children],
-                "nodes_to_left": step,
-            })
-            node = node.children[step]
+        if self._stream_with_siblings_cache is not None:
+            return self._stream_with_siblings_cache
+        stream = [
+            SiblingsItem(tuple(s.text for s in node.children), step)
+            for node, step in zip(self.current_path, self.current_stream)
+        ]
+        self._stream_with_siblings_cache = stream
         return stream
     
     def print_tree(self, file_handle, node=None, prefix=""):
@@ -137,33 +199,38 @@ class Tree:
             # here we assume that the root is empty and irrelevant and it has only one child
             node = self.root.children[0]
         
-        # print(prefix + "- " + node.text)
-        file_handle.write(prefix + "- " + node.text + "\n")
-        prefix += "\t"
-        for child in node.children:
-            self.print_tree(file_handle, child, prefix=prefix)
+        # depth first, with an explicit stack so deep trees don't hit the recursion limit
+        stack = [(node, prefix)]
+        while stack:
+            node, prefix = stack.pop()
+            # print(prefix + "- " + node.text)
+            file_handle.write(prefix + "- " + node.text + "\n")
+            stack.extend((child, prefix + "\t") for child in reversed(node.children))
     
     def collect_node_data(self, node, parent_text, data, depth=0):
         """
-        Recursive function to collect node data.
+        Collects node data depth first, starting from node.
+
+        Uses an explicit stack instead of recursion, so deep trees don't hit the recursion limit.
     
         Arguments:
-        - node: Current node.
+        - node: Node to start from.
         - parent_text: Text attribute of the parent node
         - data: List to store the data of all nodes.
-        - depth: Depth of the current node in the tree.
+        - depth: Depth of the starting node in the tree.
         """
-        data.append({
-            'node_text': node.text,
-            'parent_text': parent_text,
-            'creation_time': node.creation_time,
-            'depth': depth,
-            'node_id': node.id,
-            'parent_id': node.parent_id
-        })
-    
-        for child in node.children:
-            self.collect_node_data(child, node.text, data, depth + 1)
+        stack = [(node, parent_text, depth)]
+        while stack:
+            node, parent_text, depth = stack.pop()
+            data.append({
+                'node_text': node.text,
+                'parent_text': parent_text,
+                'creation_time': node.creation_time,
+                'depth': depth,
+                'node_id': node.id,
+                'parent_id': node.parent_id
+            })
+            stack.extend((child, node.text, depth + 1) for child in reversed(node.children))
 
     def export_tree_to_csv(self, filename):
         """
@@ -181,6 +248,58 @@ class Tree:
             writer.writeheader()
             writer.writerows(data)
 
+    def to_records(self):
+        """
+        Yields a flat record for every node, breadth first, so parents always come before their children.
+        """
+        queue = deque([self.root])
+        while queue:
+            node = queue.popleft()
+            yield node.to_record()
+            queue.extend(node.children)
+
+    @classmethod
+    def from_records(cls, records):
+        """
+        Rebuilds a tree from the records of to_records (followed by any from the journal).
+
+        Records with an id that's already in the tree are skipped, parents have to come before their children.
+        Also moves Node.node_id past the loaded ids, so that new nodes don't reuse them.
+        """
+        tree = cls()
+        nodes = {}
+        for record in records:
+            if record["id"] in nodes:
+                continue
+            parent = nodes[record["parent_id"]] if record["parent_id"] is not None else None
+            node = Node(record["text"], parent=parent)
+            node.creation_time = record["creation_time"]
+            node.id = record["id"]
+            if parent:
+                parent.add_child(node)
+            else:
+                tree.root = node
+            nodes[node.id] = node
+        Node.node_id = max(nodes, default=-1) + 1
+        tree.current_path = [tree.root]
+        return tree
+
+    def assign_ids(self):
+        """
+        Numbers all nodes again, breadth first.
+
+        Trees from older pickles have nodes without ids, or the same ids handed out again in later sessions,
+        which the records need to be unique.
+        """
+        Node.node_id = 0
+        queue = deque([self.root])
+        while queue:
+            node = queue.popleft()
+            node.id = Node.node_id
+            node.parent_id = node.parent.id if node.parent else None
+            Node.node_id += 1
+            queue.extend(node.children)
+
 class Editor:
     def __init__(self, term):
         self.term = term
@@ -192,8 +311,13 @@ class Editor:
         self.line_in_para = 0
 
         # for writing mode
-        self.current_text = ""
-        self.cursor_position = 0
+        # the text is kept as the characters left of the cursor, and the ones right of it in reverse order,
+        # so typing and moving the cursor only push and pop at the ends of the two lists
+        self._left = []
+        self._right = []
+        self._current_text = ""
+        # goes up with every change to the text
+        self._text_version = 0
         
         # formatting
         self.column_width = 35
@@ -203,8 +327,26 @@ class Editor:
         self.unhighlight = term.color(8)
         self.cursor_style = lambda x: term.on_white(term.black(x))
 
-        # buffer for smooth display
-        self.last_display = []
+        # the escape sequences each style wraps text in, see style_codes
+        self._style_codes = {None: ("", "")}
+
+        # double buffer of (char, style) cells for smooth display
+        # only the cells that differ between the two get written to the terminal
+        self.front_buffer = []
+        self.back_buffer = []
+        self.buffer_size = None
+        # everything the last frame was generated from, see update_display
+        self._last_frame_key = None
+
+        # layout that only depends on the terminal width, see generate_display
+        self._cached_width = None
+        self._pad_left = 0
+        self._pad_left_str = ""
+        self._full_col_width = None
+        self._blank_row = []
+
+        # laid out and styled rows of stream items, see generate_display
+        self._styled_row_cache = {}
 
         # timing for catch up
         self.current_timer = initial_timer
@@ -213,11 +355,52 @@ class Editor:
         self.shuttle = []
         self.show_shuttle = True
 
-    def generate_display(self):
-        current_text = self.current_text[:self.cursor_position] + "⎸" + self.current_text[self.cursor_position:]
+        # keys are handled on the input thread and the display is rendered on the main one
+        # lock guards the editor state between the two, dirty is set whenever there's something new to render
+        self.lock = threading.Lock()
+        self.dirty = threading.Event()
+        self.dirty.set()
+
+    @property
+    def current_text(self):
+        # joined on demand, and kept until the text changes again
+        if self._current_text is None:
+            self._current_text = "".join(self._left) + "".join(reversed(self._right))
+        return self._current_text
+
+    @property
+    def cursor_position(self):
+        return len(self._left)
+
+    def clear_text(self):
+        self._left = []
+        self._right = []
+        self._current_text = ""
+        self._text_version += 1
+
+    def generate_display(self, size):
+        """
+        Lays out the stream and writes the visible part of it into the back buffer.
+
+        size is the (height, width) of the buffers, which is read once per frame in update_display,
+        so that a resize in the middle of a frame can't make the rows come out at different widths.
+
+        Rows are built as lists of (text, style) spans, where style is one of the formatters above
+        (or None for plain text), and only the rows in the scroll view are written out as cells.
+        """
+        current_text = "".join(self._left) + "⎸" + "".join(reversed(self._right))
         current_text_wrapped = text_wrap(current_text, self.column_width)
-        pad_left = (self.term.width - self.column_width) // 2
-        full_col_width = self.column_width + self.gap_width
+        term_height, term_width = size
+        if term_width != self._cached_width:
+            # these only depend on the terminal width, so only work them out again when it changes
+            self._cached_width = term_width
+            self._pad_left = (term_width - self.column_width) // 2
+            self._pad_left_str = " " * self._pad_left
+            self._full_col_width = self.column_width + self.gap_width
+            self._blank_row = [BLANK_CELL] * term_width
+        pad_left = self._pad_left
+        pad_left_str = self._pad_left_str
+        full_col_width = self._full_col_width
 
         rows = []
         scroll_index = 0
@@ -225,94 +408,198 @@ class Editor:
         stream = self.tree.get_stream_with_siblings()
 
         if not stream:
-            rows = [" " * pad_left + self.highlight(line) for line in current_text_wrapped]
+            rows = [[(pad_left_str, None), (line, self.highlight)] for line in current_text_wrapped]
             scroll_index = len(rows)
 
         def format_row(column_texts, nodes_to_left):
             formatted_texts = [text_wrap(text, self.column_width) for text in column_texts]
-            max_height = max(len(lines) for lines in formatted_texts) if formatted_texts else 0
+            heights = [len(lines) for lines in formatted_texts]
+            max_height = max(heights) if heights else 0
             for line_num in range(max_height):
-                full_line = ""
-                for column_lines in formatted_texts:
-                    chunk = column_lines[line_num] if line_num < len(column_lines) else ""
-                    full_line += f"{chunk:<{full_col_width}}"
+                full_line = "".join([
+                    (column_lines[line_num] if line_num < height else "").ljust(full_col_width)
+                    for column_lines, height in zip(formatted_texts, heights)
+                ])
                 # center the line
-                full_line = " " * pad_left + full_line
+                full_line = pad_left_str + full_line
                 # shift it left
                 full_line = full_line[nodes_to_left * full_col_width:] 
                 # cut off the right
-                full_line = full_line[:self.term.width]
+                full_line = full_line[:term_width]
                 yield full_line
                 
         for i, item in enumerate(stream):
-            is_selected = i+1 is self.selected_index
-
-            format_ = self.highlight if is_selected and self.reading_mode else self.unhighlight
-            for line in format_row(item["texts"], item["nodes_to_left"]):
-                rows.append(format_(line))
+            is_selected = i+1 == self.selected_index
+
+            # the rows of a stream item only change with its texts, position and style, so reuse them across frames
+            style_tag = "selected" if is_selected and self.reading_mode else "unselected"
+            key = (item.texts, item.nodes_to_left, style_tag, self.column_width, term_width)
+            item_rows = self._styled_row_cache.get(key)
+            if item_rows is None:
+                format_ = self.highlight if style_tag == "selected" else self.unhighlight
+                item_rows = [[(line, format_)] for line in format_row(item.texts, item.nodes_to_left)]
+                if len(self._styled_row_cache) >= styled_row_cache_size:
+                    self._styled_row_cache.clear()
+                self._styled_row_cache[key] = item_rows
+            rows.extend(item_rows)
 
             if is_selected and self.reading_mode:
                 scroll_index = len(rows) # set scroll view to here
 
             # add current text in writing mode
             if is_selected and not self.reading_mode:
-                rows.append("")
+                rows.append([])
                 # get sibling nodes
                 siblings = [node.text for node in self.tree.node_at_index(self.selected_index).children]
                 # add current text
                 for line in format_row(siblings + [current_text], len(siblings)):
-                    rows.append(self.highlight(line))
+                    rows.append([(line, self.highlight)])
 
                 scroll_index = len(rows) # set scroll view to here
-                rows += [""] * self.current_timer
+                rows += [[]] * self.current_timer
             
-            rows.append("")
+            rows.append([])
 
         # TODO: scrolling rows
-        if self.selected_index is len(stream) and not self.reading_mode:
+        if self.selected_index == len(stream) and not self.reading_mode:
             stream = self.tree.get_stream()
             for item in stream:
-                lines = text_wrap(item["text"], self.column_width)
+                lines = text_wrap(item.text, self.column_width)
                 format = self.unhighlight
-                rows.append(
-                    " " * (pad_left - (1 + item["num_before"]))
-                    + format("<" * item["num_before"]) + " "
-                    + format(lines[0]) + " " * (self.column_width - len(lines[0]))
-                    + " " + format(">" * item["num_after"])
-                )
-                rows.extend([" " * pad_left + format(line) for line in lines[1:]])
-                rows.append("")
+                rows.append([
+                    (" " * (pad_left - (1 + item.num_before)), None),
+                    ("<" * item.num_before, format),
+                    (" ", None),
+                    (lines[0], format),
+                    (" " * (self.column_width - len(lines[0])) + " ", None),
+                    (">" * item.num_after, format),
+                ])
+                rows.extend([[(pad_left_str, None), (line, format)] for line in lines[1:]])
+                rows.append([])
 
         # scrolling 
-        middle_height = self.term.height // 2
+        middle_height = term_height // 2
         scroll_index += middle_height
-        rows = [""] * middle_height + rows
+        rows = [[]] * middle_height + rows
 
         start_index = scroll_index - middle_height
-        end_index = scroll_index + self.term.height
+        end_index = scroll_index + term_height
         
-        ret = rows[start_index:end_index]
+        visible_rows = rows[start_index:end_index]
 
-        return ret
-    
-    def update_display(self):
-        with self.term.hidden_cursor():
-            new_display = self.generate_display()
+        blank_row = self._blank_row
+        for y, row in enumerate(self.back_buffer):
+            row[:] = blank_row
+            if y < len(visible_rows):
+                self.put_row(y, visible_rows[y])
 
-            # update difference
-            for i, (old_line, new_line) in enumerate(zip_longest(self.last_display, new_display, fillvalue="")):
-                if old_line != new_line:
-                    with self.term.location(0, i):
-                        print(self.term.clear_eol, end="")
-                        print(new_line, end="")
-            for i in range(len(new_display), len(self.last_display)):
-                with self.term.location(0, i):
-                    print(self.term.clear_eol, end="")
+    def put_row(self, y, spans):
+        """
+        Writes a row of (text, style) spans into the back buffer, one cell per terminal column.
 
-            self.last_display = new_display
+        Wide characters (like CJK or emoji) take up two columns, so they're followed by an empty placeholder cell,
+        which keeps the cells lined up with what's on screen. Anything past the right edge of the terminal is cut off.
+        """
+        row = self.back_buffer[y]
+        width = len(row)
+        x = 0
+        for text, style in spans:
+            if text.isascii():
+                text = text[:width - x]
+                # slice assignment from zip/repeat builds the cells in C rather than one character at a time in python
+                row[x:x + len(text)] = zip(text, repeat(style))
+                x += len(text)
+                continue
+            for char in text:
+                char_width = wcwidth(char)
+                if char_width == 0 and x > 0:
+                    # combining characters go on top of the one before (skipping a wide character's placeholder)
+                    target = x - 2 if row[x - 1][0] == "" and x > 1 else x - 1
+                    row[target] = (row[target][0] + char, row[target][1])
+                    continue
+                if x >= width:
+                    return
+                if char_width == 2:
+                    if x + 1 >= width:
+                        # no room for it in the last column
+                        row[x] = (" ", style)
+                        return
+                    row[x] = (char, style)
+                    row[x + 1] = ("", style)
+                    x += 2
+                else:
+                    row[x] = (char, style)
+                    x += 1
+
+    def blank_buffer(self, size):
+        height, width = size
+        return [[BLANK_CELL] * width for _ in range(height)]
+
+    def style_codes(self, style):
+        """
+        Returns the (prefix, suffix) escape sequences that style puts around text.
+
+        They're worked out once per style by styling a placeholder, so rendering is plain string concatenation.
+        """
+        codes = self._style_codes.get(style)
+        if codes is None:
+            codes = tuple(style("\0").split("\0"))
+            self._style_codes[style] = codes
+        return codes
+
+    def render_cells(self, cells):
+        """
+        Turns a run of cells into a printable string, styling consecutive cells that share a style together.
+        """
+        parts = []
+        for style, group in groupby(cells, key=itemgetter(1)):
+            prefix, suffix = self.style_codes(style)
+            parts.append(prefix + "".join(char for char, _ in group) + suffix)
+        return "".join(parts)
+
+    def update_display(self):
+        # if nothing that goes into the frame has changed, neither has the frame
+        size = (self.term.height, self.term.width)
+        frame_key = (
+            tuple(self.tree.current_stream), self.selected_index, self.cursor_position, self.reading_mode,
+            self.current_timer, id(self.tree), self._text_version, size,
+        )
+        if frame_key == self._last_frame_key:
+            return
+        self._last_frame_key = frame_key
+
+        if size != self.buffer_size:
+            # first frame or the terminal was resized, so start over from an empty screen
+            self.buffer_size = size
+            self.front_buffer = self.blank_buffer(size)
+            self.back_buffer = self.blank_buffer(size)
+            print(self.term.clear, end="")
+
+        self.generate_display(size)
+
+        # diff the buffers and only write out runs of changed cells
+        output = []
+        for y, (old_row, new_row) in enumerate(zip(self.front_buffer, self.back_buffer)):
+            if old_row == new_row:
+                continue
+            x = 0
+            while x < len(new_row):
+                if old_row[x] == new_row[x]:
+                    x += 1
+                    continue
+                start = x
+                while x < len(new_row) and old_row[x] != new_row[x]:
+                    x += 1
+                output.append(self.term.move_xy(start, y) + self.render_cells(new_row[start:x]))
+
+        if output:
+            with self.term.hidden_cursor():
+                print("".join(output), end="", flush=True)
+
+        self.front_buffer, self.back_buffer = self.back_buffer, self.front_buffer
 
     def lines_in_current_para(self):
-        return 1 + len(text_wrap(self.tree.get_stream()[self.selected_index-1]["text"], self.column_width))
+        return 1 + len(text_wrap(self.tree.get_stream()[self.selected_index-1].text, self.column_width))
         # # rewrite to not use get_stream
         # return 1 + len(text_wrap(self.tree.node_at_index(self.selected_index).text, self.column_width))
         # # if that works correctly, we can get rid of get_stream
@@ -320,8 +607,7 @@ class Editor:
     def set_reading_mode(self):
         self.reading_mode = True
         self.line_in_para = 0
-        self.current_text = ""
-        self.cursor_position = 0
+        self.clear_text()
         self.selected_index += 1
         if self.selected_index > len(self.tree.current_stream):
             self.tree.switch_stream(self.selected_index-1, 1, True) # added this for the metalogue
@@ -354,7 +640,7 @@ class Editor:
 
     def next_para(self, keep_in_reading_mode=False):
         self.line_in_para = 0
-        if self.selected_index is len(self.tree.current_stream):
+        if self.selected_index == len(self.tree.current_stream):
             if keep_in_reading_mode:
                 return
             self.reading_mode = False
@@ -369,8 +655,7 @@ class Editor:
     def submit_para(self):
         self.tree.grow(self.current_text, self.selected_index)
         self.selected_index += 1
-        self.current_text = ""
-        self.cursor_position = 0
+        self.clear_text()
         self.current_timer = initial_timer
 
     def handle_keypress(self, key):
@@ -390,19 +675,20 @@ class Editor:
                     # if self.current_text:
                     #    self.submit_para()
                     self.set_reading_mode()
-            elif key.name == "KEY_BACKSPACE" and self.current_text and not self.reading_mode:
-                self.current_text = self.current_text[:self.cursor_position-1] + self.current_text[self.cursor_position:]
-                self.cursor_position = max(0, self.cursor_position-1)
+            elif key.name == "KEY_BACKSPACE" and self._left and not self.reading_mode:
+                self._left.pop()
+                self._current_text = None
+                self._text_version += 1
             elif key.name == "KEY_RIGHT":
                 if self.reading_mode:
                     self.selected_index = self.tree.switch_stream(self.selected_index, 1)
-                else:
-                    self.cursor_position = min(len(self.current_text), self.cursor_position+1)
+                elif self._right:
+                    self._left.append(self._right.pop())
             elif key.name == "KEY_LEFT":
                 if self.reading_mode:
                     self.selected_index = self.tree.switch_stream(self.selected_index, -1)
-                else:
-                    self.cursor_position = max(0, self.cursor_position-1)
+                elif self._left:
+                    self._right.append(self._left.pop())
             elif key.name == "KEY_DOWN":
                 self.next_line()
             elif key.name == "KEY_UP":
@@ -426,46 +712,139 @@ class Editor:
                     elif key == "l" or key == "i":
                         self.selected_index = self.tree.switch_stream(self.selected_index, 1)
                     elif key == "p": #shuttle
-                        self.shuttle.append(self.tree.get_stream()[self.selected_index-1]["text"])
+                        self.shuttle.append(self.tree.get_stream()[self.selected_index-1].text)
                 if not self.reading_mode:
-                    self.current_text = self.current_text[:self.cursor_position] + key + self.current_text[self.cursor_position:]
-                    self.cursor_position += 1
+                    self._left.append(key)
+                    self._current_text = None
+                    self._text_version += 1
             else: #timer event
                 self.next_line()
     
 term = Terminal()
 editor = Editor(term)
 
-# load tree from pickle
-try:
-    with open(args.file + ".pickle", "rb") as f:
-        editor.tree = pickle.load(f)
-        editor.tree.current_stream = []
-        node = editor.tree.root
-        while node.children:
-            editor.tree.current_stream += [0]
-            node = node.children[0]
-        #editor.selected_index = len(editor.tree.current_stream)
-except FileNotFoundError:
-    pass
+def read_journal(filename):
+    """
+    Returns the records in the journal, or an empty list if there isn't one.
+    """
+    records = []
+    try:
+        with open(filename + ".log", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # a write that was cut off by a crash, the records after it are still good
+                    continue
+    except FileNotFoundError:
+        pass
+    return records
+
+def save_snapshot(tree, filename):
+    """
+    Saves the full tree as json and empties the journal, since everything in it is in the snapshot now.
+    """
+    # through a temporary file, so a crash can't leave half a snapshot
+    with open(filename + ".json.tmp", "w", encoding="utf-8") as f:
+        json.dump(list(tree.to_records()), f, ensure_ascii=False)
+    os.replace(filename + ".json.tmp", filename + ".json")
+    open(filename + ".log", "w").close()
+
+def load_tree(filename):
+    """
+    Loads the tree from the json snapshot, or from the pickle that earlier versions saved instead,
+    and adds the nodes from the journal that didn't make it into the snapshot.
+
+    If there were any, they're compacted into a new snapshot right away, so that this session's journal
+    doesn't get appended to whatever a crash left at the end of the old one.
+
+    Returns None if there's none of them.
+    """
+    # the gc would otherwise keep kicking in while all the nodes get allocated
+    gc.disable()
+    try:
+        tree = None
+        try:
+            with open(filename + ".json", encoding="utf-8") as f:
+                tree = Tree.from_records(json.load(f))
+        except FileNotFoundError:
+            try:
+                with open(filename + ".pickle", "rb", buffering=pickle_buffer_size) as f:
+                    tree = pickle.load(f)
+                tree.assign_ids()
+            except FileNotFoundError:
+                pass
+        journal = read_journal(filename)
+        if journal:
+            # the last session didn't exit cleanly
+            snapshot = tree.to_records() if tree else []
+            tree = Tree.from_records(chain(snapshot, journal))
+            save_snapshot(tree, filename)
+        return tree
+    finally:
+        gc.enable()
+
+tree = load_tree(args.file)
+if tree:
+    editor.tree = tree
+    editor.tree.current_stream = []
+    editor.tree.current_path = [editor.tree.root]
+    node = editor.tree.root
+    while node.children:
+        editor.tree.current_stream += [0]
+        node = node.children[0]
+        editor.tree.current_path.append(node)
+    editor.tree.invalidate_stream_cache()
+    #editor.selected_index = len(editor.tree.current_stream)
+
+# journal new nodes as they're grown, it always starts with the root so that it can rebuild the tree on its own
+editor.tree.journal = open(args.file + ".log", "a", buffering=1, encoding="utf-8")
+editor.tree.journal.write(json.dumps(editor.tree.root.to_record(), ensure_ascii=False) + "\n")
+
+input_error = None
+
+def read_input():
+    """
+    Input thread: handles keys (and timer events) as they come and flags the display for a redraw.
+    """
+    global input_error
+    try:
+        while True:
+            key = term.inkey(timeout=autoscroll_delay)
+            with editor.lock:
+                editor.handle_keypress(key)
+            editor.dirty.set()
+    except Exception as e:
+        # hand it over to the main thread, which raises it
+        input_error = e
+        editor.dirty.set()
 
 print(term.clear)
 with term.cbreak():
+    threading.Thread(target=read_input, daemon=True).start()
+    last_frame = 0
     while True:
         try:
-            editor.update_display()
-            key = term.inkey(timeout=autoscroll_delay)
-            editor.handle_keypress(key)
+            editor.dirty.wait()
+            # cap the frame rate, anything that comes in while waiting is drawn in the same frame
+            time.sleep(max(0, last_frame + frame_time - time.monotonic()))
+            editor.dirty.clear()
+            if input_error:
+                raise input_error
+            with editor.lock:
+                editor.update_display()
+            last_frame = time.monotonic()
         except KeyboardInterrupt:
-            # if there's a current text, submit it
-            if editor.current_text:
-                editor.submit_para()
-            # save the tree as markdown
-            with open(args.file + ".md", "w") as f:
-                editor.tree.print_tree(f)
-            # pickle the tree
-            with open(args.file + ".pickle", "wb") as f:
-                pickle.dump(editor.tree, f)
-            # save nodes as csv
-            editor.tree.export_tree_to_csv(args.file + ".csv")
+            with editor.lock:
+                # if there's a current text, submit it
+                if editor.current_text:
+                    editor.submit_para()
+                # save the tree as markdown
+                with open(args.file + ".md", "w") as f:
+                    editor.tree.print_tree(f)
+                # save the full tree as json
+                editor.tree.journal.close()
+                save_snapshot(editor.tree, args.file)
+                # save nodes as csv
+                editor.tree.export_tree_to_csv(args.file + ".csv")
             break
@@ -0,0 +1,93 @@
+import os
+import pty
+import select
+import sys
+import time
+
+II = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ii.py")
+
+# how long to wait for anything the editor is expected to do before failing
+TIMEOUT = 30
+
+CLEAR = b"\x1b[H\x1b[2J"
+
+KEY_UP = "\x1b[A"
+
+
+class Session:
+    """
+    Runs ii.py in a pseudo terminal, so it can be typed into and then killed or interrupted.
+
+    Every step waits for something it can see, rather than for a fixed time.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.output = b""
+        self.closed = False
+        self.pid, self.fd = pty.fork()
+        if self.pid == 0:
+            os.environ["TERM"] = "xterm-256color"
+            os.execv(sys.executable, [sys.executable, II, "-f", filename])
+        # the screen is cleared once on startup, and again by the first frame,
+        # which is only drawn once the terminal is in cbreak mode and the input thread is running
+        self.wait_until(lambda: self.output.count(CLEAR) >= 2, "the first frame")
+
+    def read(self, timeout):
+        """
+        Reads whatever output there is within timeout, returns False once the editor has gone.
+        """
+        if self.closed:
+            return False
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return True
+        try:
+            output = os.read(self.fd, 65536)
+        except OSError:
+            output = b""
+        if not output:
+            self.closed = True
+            return False
+        # blessed asks for the cursor position on startup and waits for an answer
+        if b"\x1b[6n" in output:
+            os.write(self.fd, b"\x1b[1;1R")
+        self.output += output
+        return True
+
+    def wait_until(self, condition, what):
+        end = time.monotonic() + TIMEOUT
+        while not condition():
+            if time.monotonic() > end:
+                raise AssertionError("timed out waiting for " + what)
+            if not self.read(0.05) and not condition():
+                raise AssertionError("the editor exited while waiting for " + what)
+
+    def journal_lines(self):
+        try:
+            with open(self.filename + ".log", encoding="utf-8") as f:
+                return len(f.readlines())
+        except FileNotFoundError:
+            return 0
+
+    def type(self, *paragraphs):
+        """
+        Types each paragraph and submits it, waiting for it to be journaled before the next one.
+        """
+        for paragraph in paragraphs:
+            lines = self.journal_lines()
+            self.keys(paragraph + "\r")
+            self.wait_until(lambda: self.journal_lines() > lines, "%r to be journaled" % paragraph)
+
+    def keys(self, keys):
+        os.write(self.fd, keys.encode())
+
+    def stop(self, sig):
+        os.kill(self.pid, sig)
+        # keep reading until the pty closes, so the editor can't block on a full one while saving
+        end = time.monotonic() + TIMEOUT
+        while self.read(0.05):
+            if time.monotonic() > end:
+                raise AssertionError("timed out waiting for the editor to exit")
+        os.waitpid(self.pid, 0)
+        os.close(self.fd)
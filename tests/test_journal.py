@@ -0,0 +1,43 @@
+import json
+import os
+import signal
+import tempfile
+import unittest
+
+from session import Session
+
+
+class TestJournal(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.dir.name, "tree")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def saved_texts(self):
+        with open(self.filename + ".json", encoding="utf-8") as f:
+            return [record["text"] for record in json.load(f)]
+
+    def test_crash_restart_crash(self):
+        session = Session(self.filename)
+        session.type("a", "b")
+        session.stop(signal.SIGKILL)
+        # a record that was only half written when the process died
+        with open(self.filename + ".log", "a", encoding="utf-8") as f:
+            f.write('{"id": 3, "par')
+
+        session = Session(self.filename)
+        session.type("c", "d")
+        session.stop(signal.SIGKILL)
+
+        session = Session(self.filename)
+        session.stop(signal.SIGINT)
+
+        self.assertEqual(sorted(self.saved_texts()), ["", "a", "b", "c", "d"])
+        with open(self.filename + ".log", encoding="utf-8") as f:
+            self.assertEqual(f.read(), "")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+import json
+import os
+import signal
+import tempfile
+import unittest
+
+from session import KEY_UP, Session
+
+
+class TestTree(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.dir.name, "tree")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def saved_records(self):
+        with open(self.filename + ".json", encoding="utf-8") as f:
+            return {record["text"]: record for record in json.load(f)}
+
+    def test_grow_above_the_stream(self):
+        session = Session(self.filename)
+        session.type("a", "b")
+        session.stop(signal.SIGINT)
+
+        # after loading, going up past the first paragraph takes the selected index below 0,
+        # paragraphs written there still go under the root, same as at the top of the stream
+        session = Session(self.filename)
+        session.keys(KEY_UP * 3 + "\r")
+        session.type("x")
+        session.type("y")
+        session.stop(signal.SIGINT)
+
+        records = self.saved_records()
+        self.assertEqual(records["x"]["parent_id"], records[""]["id"])
+        self.assertEqual(records["y"]["parent_id"], records[""]["id"])
+        self.assertEqual(records["b"]["parent_id"], records["a"]["id"])
+
+
+if __name__ == "__main__":
+    unittest.main()
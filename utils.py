@@ -1,20 +1,33 @@
+import functools
+import sys
+
+
+@functools.lru_cache(maxsize=8192)
 def text_wrap(text, line_length):
+    # cached, so it returns a tuple that callers can't mutate
+    # the current line and word are kept as start/end indices into text, and only finished lines get sliced out
+    # (words are separated by exactly one space in text, so a line of words is always a single slice)
     lines = []
-    words = text.split(' ')
-    line = ''
-    for word in words:
+    line_start = line_end = 0
+    word_start = 0
+    for word in text.split(' '):
+        word_end = word_start + len(word)
         # If the word itself is longer than the line length, split it
-        while len(word) > line_length:
-            if line:  # If there's already a line, add it to the lines list
-                lines.append(line)
-                line = ''
-            lines.append(word[:line_length])  # Add the first part of the word to the lines list
-            word = word[line_length:]  # Keep the rest of the word for the next line
+        while word_end - word_start > line_length:
+            if line_end > line_start:  # If there's already a line, add it to the lines list
+                lines.append(text[line_start:line_end])
+                line_start = line_end
+            lines.append(text[word_start:word_start + line_length])  # Add the first part of the word to the lines list
+            word_start += line_length  # Keep the rest of the word for the next line
         # If adding the next word would exceed the line length, start a new line
-        if len(line) + len(word) + 1 > line_length:
-            lines.append(line)
-            line = word
+        if (line_end - line_start) + (word_end - word_start) + 1 > line_length:
+            lines.append(text[line_start:line_end])
+            line_start, line_end = word_start, word_end
+        elif line_end > line_start:
+            line_end = word_end  # Extend the line over the space and the word
         else:
-            line += (' ' + word if line else word)  # Add a space if not the first word in the line
-    lines.append(line)
-    return lines
\ No newline at end of file
+            line_start, line_end = word_start, word_end
+        word_start = word_end + 1
+    lines.append(text[line_start:line_end])
+    # interned, so identical lines from different paragraphs are the same object
+    return tuple(map(sys.intern, lines))